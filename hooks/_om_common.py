@@ -0,0 +1,132 @@
+"""
+Observational Memory — Shared helpers
+Directory resolution, atomic file writes, reflections archive rotation,
+LLM output cleanup and the `claude -p` response cache used by all OM hooks.
+"""
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+# Prefer orjson when available; its decode errors subclass json.JSONDecodeError
+# so callers handle both the same way
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# Cached `claude -p` responses kept per project, and the minimum call
+# duration (seconds) worth caching
+LLM_CACHE_MAX_ENTRIES = 32
+LLM_CACHE_MIN_SECONDS = 1.0
+
+# Rotate reflections.log to reflections.log.1 beyond this size (bytes)
+REFLECTIONS_LOG_MAX_BYTES = 5_000_000
+
+# Project directory prefix of a transcript path
+_PROJECT_DIR_RE = re.compile(r'(.*?/\.claude/projects/[^/]+)')
+
+# Memory directories already created by this process
+_mkdir_done = set()
+
+
+@lru_cache(maxsize=64)
+def get_project_dir(transcript_path):
+    """Extract the project directory from the transcript path."""
+    match = _PROJECT_DIR_RE.search(transcript_path)
+    if match:
+        return Path(match.group(1))
+    return Path(transcript_path).parent
+
+
+def ensure_memory_dir(project_dir):
+    """Return the project's memory directory, creating it once per process."""
+    memory_dir = project_dir / 'memory'
+    key = str(memory_dir)
+    if key not in _mkdir_done:
+        memory_dir.mkdir(parents=True, exist_ok=True)
+        _mkdir_done.add(key)
+    return memory_dir
+
+
+def get_memory_dir(transcript_path):
+    """Derive the project memory directory from transcript path."""
+    return ensure_memory_dir(get_project_dir(transcript_path))
+
+
+def get_memory_dir_from_cwd(cwd):
+    """Derive the project memory directory from working directory."""
+    project_key = cwd.replace('/', '-')
+    return ensure_memory_dir(Path.home() / '.claude' / 'projects' / project_key)
+
+
+def write_atomic(path, text):
+    """Write text to path via a temp file + rename so readers never see a partial file.
+
+    Each call gets its own temp file, so concurrent writers never share one.
+    An existing target keeps its permissions.
+    """
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=path.name + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(text.encode('utf-8'))
+        try:
+            os.chmod(tmp, path.stat().st_mode & 0o777)
+        except FileNotFoundError:
+            pass
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def strip_fence(s):
+    """Strip a Markdown code fence wrapped around LLM output."""
+    if s.startswith('```'):
+        nl = s.find('\n')
+        s = s[nl + 1:] if nl != -1 else s[3:]
+    if s.endswith('```'):
+        s = s[:-3].rstrip('\n')
+    return s
+
+
+def rotate_archive(archive_file):
+    """Move the reflections archive aside once it exceeds REFLECTIONS_LOG_MAX_BYTES."""
+    try:
+        if archive_file.stat().st_size > REFLECTIONS_LOG_MAX_BYTES:
+            os.replace(archive_file, archive_file.with_name(archive_file.name + '.1'))
+    except OSError:
+        pass
+
+
+def llm_cache_key(model, full_prompt):
+    """Hash the inputs of a `claude -p` call."""
+    return hashlib.blake2b((model + "\x00" + full_prompt).encode('utf-8'), digest_size=16).hexdigest()
+
+
+def load_llm_cache(memory_dir):
+    """Load cached `claude -p` responses (oldest first)."""
+    cache_file = memory_dir / '.llm-cache.json'
+    try:
+        cache = json_loads(cache_file.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_llm_cache(memory_dir, cache):
+    """Persist cached responses, evicting the oldest entries beyond the cap."""
+    while len(cache) > LLM_CACHE_MAX_ENTRIES:
+        del cache[next(iter(cache))]
+    try:
+        write_atomic(memory_dir / '.llm-cache.json', json.dumps(cache, separators=(',', ':')))
+    except OSError:
+        pass
@@ -0,0 +1,129 @@
+"""
+Observational Memory — Transcript formatting
+Turns transcript entries into the plain text the observer reads.
+
+This module is the per-entry hot path and is fully annotated so it can be
+compiled with mypyc (`cd hooks && python -m mypyc _om_format.py`). A compiled
+extension next to this file is picked up by a plain `import _om_format`
+ahead of the source; without it the pure-Python version is used.
+"""
+
+import collections
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+
+def _format_user(entry: Dict[str, Any]) -> str:
+    msg = entry.get('message', entry)
+    text = _extract_text_from_content(msg.get('content', ''))
+    return f"[User]: {text}" if text else ""
+
+
+def _format_assistant(entry: Dict[str, Any]) -> str:
+    msg = entry.get('message', entry)
+    text = _extract_assistant_content(msg.get('content', ''))
+    return f"[Assistant]: {text}" if text else ""
+
+
+def _format_summary(entry: Dict[str, Any]) -> str:
+    summary = entry.get('summary', '')
+    return f"[Context Summary]: {summary}" if summary else ""
+
+
+# Transcript entry type -> formatter
+_MSG_HANDLERS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    'human': _format_user,
+    'user': _format_user,
+    'assistant': _format_assistant,
+    'summary': _format_summary,
+}
+
+
+def extract_text_content(entry: Any) -> str:
+    """Extract human-readable text from a transcript entry."""
+    if not isinstance(entry, dict):
+        return ""
+
+    handler = _MSG_HANDLERS.get(entry.get('type', ''))
+    return handler(entry) if handler else ""
+
+
+def _extract_text_from_content(content: Any) -> str:
+    """Extract plain text from message content (string or content blocks)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        texts: List[str] = []
+        for block in content:
+            if isinstance(block, dict) and block.get('type') == 'text':
+                texts.append(block.get('text', ''))
+            elif isinstance(block, str):
+                texts.append(block)
+        return ' '.join(texts)
+    return ""
+
+
+def _extract_assistant_content(content: Any) -> str:
+    """Extract assistant message content, summarizing tool usage."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        texts: List[str] = []
+        for block in content:
+            if isinstance(block, dict):
+                if block.get('type') == 'text':
+                    text = block.get('text', '').strip()
+                    if text:
+                        texts.append(text)
+                elif block.get('type') == 'tool_use':
+                    tool_name = block.get('name', 'unknown')
+                    tool_input = block.get('input', {})
+                    texts.append(_summarize_tool_use(tool_name, tool_input))
+            elif isinstance(block, str):
+                texts.append(block)
+        return ' '.join(texts)
+    return ""
+
+
+# Tool name -> concise summary of its input
+_TOOL_FMT: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    'Bash': lambda i: f"[Ran: {i.get('command', '')[:200]}]",
+    'Read': lambda i: f"[Read: {i.get('file_path', '?')}]",
+    'Write': lambda i: f"[Wrote: {i.get('file_path', '?')}]",
+    'Edit': lambda i: f"[Edited: {i.get('file_path', '?')}]",
+    'Glob': lambda i: f"[Glob: {i.get('pattern', '?')}]",
+    'Grep': lambda i: f"[Grep: {i.get('pattern', '?')}]",
+    'Task': lambda i: f"[Delegated: {i.get('description', '?')}]",
+    'WebFetch': lambda i: f"[Fetched: {i.get('url', '?')}]",
+    'WebSearch': lambda i: f"[Searched: {i.get('query', '?')}]",
+}
+
+
+def _summarize_tool_use(tool_name: str, tool_input: Dict[str, Any]) -> str:
+    """Create a concise summary of a tool invocation."""
+    fmt: Optional[Callable[[Dict[str, Any]], str]] = _TOOL_FMT.get(tool_name)
+    return fmt(tool_input) if fmt else f"[Tool: {tool_name}]"
+
+
+def format_messages_tail(messages: List[Dict[str, Any]], budget: int) -> Tuple[str, int]:
+    """Format the most recent messages into readable text for the observer.
+
+    Walks messages newest-first and stops once `budget` chars are collected,
+    so older messages that would be truncated anyway are never formatted.
+    Returns (text, total) where total is the untruncated length of the
+    formatted messages collected.
+    """
+    parts: Deque[str] = collections.deque()
+    total = 0
+    # Index loop rather than reversed(): mypyc can't compile reversed() over this list
+    for idx in range(len(messages) - 1, -1, -1):
+        text = extract_text_content(messages[idx])
+        if not text:
+            continue
+        total += len(text) + (2 if parts else 0)
+        parts.appendleft(text)
+        if total >= budget:
+            break
+    joined = '\n\n'.join(parts)
+    if len(joined) > budget:
+        joined = joined[-budget:]
+    return joined, total
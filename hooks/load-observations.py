@@ -7,19 +7,40 @@ Claude Code SessionStart hook that injects observations into context.
 import json
 import sys
 import os
-import re
 from datetime import datetime, timezone
-from pathlib import Path
+
+from _om_common import get_project_dir, json_loads
 
 MAX_CONTEXT_CHARS = 60000
 
 
-def get_project_dir(transcript_path):
-    """Extract the project directory from the transcript path."""
-    match = re.search(r'(.*?/\.claude/projects/[^/]+)', transcript_path)
-    if match:
-        return Path(match.group(1))
-    return Path(transcript_path).parent
+def _read_observations(path, st):
+    """Return observations text, truncated to the most recent MAX_CONTEXT_CHARS.
+
+    Only the tail of the file is read, so cost is bounded regardless of file size.
+    `st` is the caller's stat of `path`, reused for the size check.
+    """
+    budget = MAX_CONTEXT_CHARS * 4  # worst-case UTF-8
+    with path.open('rb') as f:
+        if st.st_size > budget:
+            f.seek(st.st_size - budget)
+            raw = f.read()
+            # Drop the partial first line (and any partial codepoint)
+            raw = raw[raw.find(b'\n') + 1:]
+            observations = raw.decode('utf-8', 'ignore')
+            truncated = True
+        else:
+            observations = f.read().decode('utf-8')
+            truncated = False
+
+    # Keep most recent (end of file)
+    if len(observations) > MAX_CONTEXT_CHARS:
+        observations = observations[-MAX_CONTEXT_CHARS:]
+        truncated = True
+    if truncated:
+        observations = "[... older observations truncated ...]\n\n" + observations
+
+    return observations
 
 
 def main():
@@ -36,26 +57,22 @@ def main():
     memory_dir = project_dir / 'memory'
     obs_file = memory_dir / 'observations.md'
 
-    if not obs_file.exists() or obs_file.stat().st_size == 0:
+    try:
+        st = obs_file.stat()
+    except OSError:
+        sys.exit(0)
+    if st.st_size == 0:
         sys.exit(0)
 
-    observations = obs_file.read_text()
+    observations = _read_observations(obs_file, st)
     if not observations.strip():
         sys.exit(0)
 
-    char_count = len(observations)
-    approx_tokens = char_count // 4
-
-    # Truncate if too large — keep most recent (end of file)
-    if char_count > MAX_CONTEXT_CHARS:
-        observations = (
-            "[... older observations truncated ...]\n\n"
-            + observations[-MAX_CONTEXT_CHARS:]
-        )
+    approx_tokens = st.st_size // 4
 
     # Get last modified time
     try:
-        mtime = datetime.fromtimestamp(obs_file.stat().st_mtime, tz=timezone.utc)
+        mtime = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc)
         last_updated = mtime.strftime('%Y-%m-%d %H:%M UTC')
     except Exception:
         last_updated = 'unknown'
@@ -66,7 +83,7 @@ def main():
     suggested_response = None
     try:
         if state_file.exists():
-            state = json.loads(state_file.read_text())
+            state = json_loads(state_file.read_bytes())
             current_task = state.get('current_task')
             suggested_response = state.get('suggested_response')
     except (json.JSONDecodeError, IOError):
@@ -12,12 +12,23 @@ import sys
 import os
 import subprocess
 import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+from _om_common import (
+    LLM_CACHE_MIN_SECONDS, get_memory_dir, json_loads, llm_cache_key, load_llm_cache,
+    rotate_archive, save_llm_cache, strip_fence, write_atomic,
+)
+from _om_format import format_messages_tail
+
 # --- Configuration ---
 # Minimum new content (chars) before triggering observation
 MIN_NEW_CONTENT_CHARS = 2000
+# Maximum new content (chars) sent to the observer — most recent messages win
+MAX_NEW_CONTENT_CHARS = 50000
+# Transcript tail (bytes) --force parses first, doubled until it yields enough text
+FORCE_TAIL_BYTES = 200_000
 # Maximum observations file size (chars) before triggering reflection
 REFLECTION_THRESHOLD_CHARS = 40000
 # Model shorthand for claude CLI
@@ -27,139 +38,104 @@ REFLECTOR_MODEL = os.environ.get("OM_REFLECTOR_MODEL", "haiku")
 # Script directory for locating prompts
 SCRIPT_DIR = Path(__file__).resolve().parent
 
-
-def get_project_dir(transcript_path):
-    """Extract the project directory from the transcript path."""
-    match = re.search(r'(.*?/\.claude/projects/[^/]+)', transcript_path)
-    if match:
-        return Path(match.group(1))
-    return Path(transcript_path).parent
-
-
-def get_memory_dir(transcript_path):
-    """Derive the project memory directory from transcript path."""
-    project_dir = get_project_dir(transcript_path)
-    memory_dir = project_dir / 'memory'
-    memory_dir.mkdir(parents=True, exist_ok=True)
-    return memory_dir
-
-
-def read_transcript(path):
-    """Read and parse a JSONL transcript file."""
-    messages = []
+# Observer output sections — tags must be at start of line
+_OBS_RE = re.compile(
+    r'^[ \t]*<observations>(.*?)^[ \t]*</observations>', re.DOTALL | re.MULTILINE
+)
+_TASK_RE = re.compile(
+    r'^[ \t]*<current-task>(.*?)^[ \t]*</current-task>', re.DOTALL | re.MULTILINE
+)
+_RESP_RE = re.compile(
+    r'^[ \t]*<suggested-response>(.*?)^[ \t]*</suggested-response>', re.DOTALL | re.MULTILINE
+)
+_CT_SUB_RE = re.compile(
+    r'^[ \t]*<current-task>.*?^[ \t]*</current-task>', re.DOTALL | re.MULTILINE
+)
+_SR_SUB_RE = re.compile(
+    r'^[ \t]*<suggested-response>.*?^[ \t]*</suggested-response>', re.DOTALL | re.MULTILINE
+)
+
+# Environment for child `claude -p` calls, built on first use
+_BASE_ENV = None
+
+
+def iter_transcript(path, start_line=0, byte_offset=0):
+    """Stream entries from a JSONL transcript file.
+
+    Lines before `start_line` are counted but not parsed, so the cost of
+    reading a transcript scales with the unobserved tail only. When
+    `byte_offset` (the offset of `start_line`) is known, reading seeks
+    straight to it instead. Each entry carries `_line_num` and
+    `_end_offset`, the byte offset just past its line.
+    """
     try:
-        with open(path, 'r') as f:
-            for line_num, line in enumerate(f):
+        with open(path, 'rb', buffering=1 << 20) as f:
+            if byte_offset:
+                f.seek(byte_offset)
+                first_line = start_line
+            else:
+                first_line = 0
+            offset = byte_offset
+            for line_num, line in enumerate(f, first_line):
+                offset += len(line)
+                if line_num < start_line:
+                    continue
                 line = line.strip()
                 if not line:
                     continue
                 try:
-                    entry = json.loads(line)
-                    entry['_line_num'] = line_num
-                    messages.append(entry)
-                except json.JSONDecodeError:
+                    entry = json_loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
                     continue
+                if isinstance(entry, dict):
+                    entry['_line_num'] = line_num
+                    entry['_end_offset'] = offset
+                    yield entry
     except FileNotFoundError:
-        pass
-    return messages
-
-
-def extract_text_content(entry):
-    """Extract human-readable text from a transcript entry."""
-    if not isinstance(entry, dict):
-        return ""
-
-    msg_type = entry.get('type', '')
-
-    if msg_type in ('human', 'user'):
-        msg = entry.get('message', entry)
-        content = msg.get('content', '')
-        text = _extract_text_from_content(content)
-        return f"[User]: {text}" if text else ""
-
-    elif msg_type in ('assistant',):
-        msg = entry.get('message', entry)
-        content = msg.get('content', '')
-        text = _extract_assistant_content(content)
-        return f"[Assistant]: {text}" if text else ""
-
-    elif msg_type == 'summary':
-        summary = entry.get('summary', '')
-        return f"[Context Summary]: {summary}" if summary else ""
-
-    return ""
-
-
-def _extract_text_from_content(content):
-    """Extract plain text from message content (string or content blocks)."""
-    if isinstance(content, str):
-        return content
-    if isinstance(content, list):
-        texts = []
-        for block in content:
-            if isinstance(block, dict) and block.get('type') == 'text':
-                texts.append(block.get('text', ''))
-            elif isinstance(block, str):
-                texts.append(block)
-        return ' '.join(texts)
-    return ""
-
-
-def _extract_assistant_content(content):
-    """Extract assistant message content, summarizing tool usage."""
-    if isinstance(content, str):
-        return content
-    if isinstance(content, list):
-        texts = []
-        for block in content:
-            if isinstance(block, dict):
-                if block.get('type') == 'text':
-                    text = block.get('text', '').strip()
-                    if text:
-                        texts.append(text)
-                elif block.get('type') == 'tool_use':
-                    tool_name = block.get('name', 'unknown')
-                    tool_input = block.get('input', {})
-                    texts.append(_summarize_tool_use(tool_name, tool_input))
-            elif isinstance(block, str):
-                texts.append(block)
-        return ' '.join(texts)
-    return ""
-
-
-def _summarize_tool_use(tool_name, tool_input):
-    """Create a concise summary of a tool invocation."""
-    if tool_name == 'Bash':
-        cmd = tool_input.get('command', '')[:200]
-        return f"[Ran: {cmd}]"
-    elif tool_name == 'Read':
-        return f"[Read: {tool_input.get('file_path', '?')}]"
-    elif tool_name == 'Write':
-        return f"[Wrote: {tool_input.get('file_path', '?')}]"
-    elif tool_name == 'Edit':
-        return f"[Edited: {tool_input.get('file_path', '?')}]"
-    elif tool_name == 'Glob':
-        return f"[Glob: {tool_input.get('pattern', '?')}]"
-    elif tool_name == 'Grep':
-        return f"[Grep: {tool_input.get('pattern', '?')}]"
-    elif tool_name == 'Task':
-        return f"[Delegated: {tool_input.get('description', '?')}]"
-    elif tool_name == 'WebFetch':
-        return f"[Fetched: {tool_input.get('url', '?')}]"
-    elif tool_name == 'WebSearch':
-        return f"[Searched: {tool_input.get('query', '?')}]"
-    else:
-        return f"[Tool: {tool_name}]"
+        return
 
 
-def format_messages_for_observer(messages):
-    """Format messages into readable text for the observer."""
-    formatted = []
-    for msg in messages:
-        text = extract_text_content(msg)
-        if text:
-            formatted.append(text)
-    return '\n\n'.join(formatted)
+def _tail_start(path, max_bytes):
+    """Return (byte_offset, line_num) of the first whole line in the last `max_bytes` of path."""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        start = max(0, size - max_bytes)
+        line_num = 0
+        remaining = start
+        chunk = b''
+        while remaining:
+            chunk = f.read(min(1 << 20, remaining))
+            if not chunk:
+                break
+            line_num += chunk.count(b'\n')
+            remaining -= len(chunk)
+        if start and not chunk.endswith(b'\n'):
+            start += len(f.readline())
+            line_num += 1
+    return start, line_num
+
+
+def read_transcript_tail(path, budget, max_bytes=FORCE_TAIL_BYTES):
+    """Parse the end of a JSONL transcript until it yields `budget` chars of text.
+
+    Returns (messages, text) as format_messages_tail would for the whole
+    file. Parsing starts at the first whole line in the last `max_bytes`;
+    when that tail formats to less than `budget` chars (a huge final line,
+    or tool output that yields no text) the window is doubled until the
+    budget is met or the start of the file is reached. Only parsing is
+    bounded: earlier lines are still read to count newlines, so
+    `_line_num` stays accurate.
+    """
+    while True:
+        try:
+            start, line_num = _tail_start(path, max_bytes)
+        except FileNotFoundError:
+            return [], ''
+        messages = list(iter_transcript(path, start_line=line_num, byte_offset=start))
+        text, total = format_messages_tail(messages, budget)
+        if total >= budget or start == 0:
+            return messages, text
+        max_bytes *= 2
 
 
 def load_state(memory_dir):
@@ -167,13 +143,14 @@ def load_state(memory_dir):
     state_file = memory_dir / '.observer-state.json'
     if state_file.exists():
         try:
-            return json.loads(state_file.read_text())
+            return json_loads(state_file.read_bytes())
         except (json.JSONDecodeError, IOError):
             pass
-    return {'last_observed_line': 0, 'transcript_path': ''}
+    return {'last_observed_line': 0, 'transcript_path': '', 'byte_offset': 0}
 
 
-def save_state(memory_dir, last_line, transcript_path, current_task=None, suggested_response=None):
+def save_state(memory_dir, last_line, transcript_path, current_task=None, suggested_response=None,
+               byte_offset=None):
     """Save observer cursor state."""
     state_file = memory_dir / '.observer-state.json'
     state = {
@@ -181,11 +158,13 @@ def save_state(memory_dir, last_line, transcript_path, current_task=None, sugges
         'transcript_path': transcript_path,
         'last_observed_at': datetime.now(timezone.utc).isoformat()
     }
+    if byte_offset is not None:
+        state['byte_offset'] = byte_offset
     if current_task:
         state['current_task'] = current_task
     if suggested_response:
         state['suggested_response'] = suggested_response
-    state_file.write_text(json.dumps(state, indent=2))
+    write_atomic(state_file, json.dumps(state, separators=(',', ':')))
 
 
 def load_prompt(name):
@@ -196,10 +175,12 @@ def load_prompt(name):
     return ""
 
 
-def call_claude(system_prompt, user_prompt, model=None):
+def call_claude(system_prompt, user_prompt, model=None, memory_dir=None):
     """Call Claude via `claude -p` pipe mode.
 
     Uses an environment variable guard to prevent recursive hook invocation.
+    When `memory_dir` is given, responses are cached by a hash of the model
+    and prompt so identical requests don't spawn `claude -p` again.
     """
     # Prevent recursion: if we're already inside an OM hook call, bail out
     if os.environ.get('OM_HOOK_ACTIVE'):
@@ -214,34 +195,58 @@ def call_claude(system_prompt, user_prompt, model=None):
         f"{user_prompt}"
     )
 
-    # Set guard env var so any child `claude -p` won't re-trigger this hook
-    env = os.environ.copy()
-    env['OM_HOOK_ACTIVE'] = '1'
-    env.pop('CLAUDECODE', None)  # Allow nested claude -p invocation
+    cache = None
+    if memory_dir is not None:
+        key = llm_cache_key(model, full_prompt)
+        cache = load_llm_cache(memory_dir)
+        if key in cache:
+            return cache[key]
+
+    # Set guard env var so any child `claude -p` won't re-trigger this hook.
+    # Built once and never mutated afterwards, so it is safe to share.
+    global _BASE_ENV
+    if _BASE_ENV is None:
+        env = dict(os.environ)
+        env['OM_HOOK_ACTIVE'] = '1'
+        env.pop('CLAUDECODE', None)  # Allow nested claude -p invocation
+        _BASE_ENV = env
+    env = _BASE_ENV
 
     try:
-        result = subprocess.run(
+        # Hand the pre-encoded prompt to the pipe and decode stdout once
+        prompt_bytes = full_prompt.encode('utf-8')
+        started = time.monotonic()
+        with subprocess.Popen(
             ['claude', '-p', '--model', model],
-            input=full_prompt,
-            capture_output=True,
-            text=True,
-            timeout=120,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             env=env,
-        )
-
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
-
-        if result.stderr.strip():
-            log_error(f"claude -p stderr: {result.stderr[:500]}")
+        ) as proc:
+            try:
+                stdout, stderr = proc.communicate(prompt_bytes, timeout=120)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                log_error("claude -p timed out")
+                return None
+        elapsed = time.monotonic() - started
+
+        output = stdout.decode('utf-8', 'replace').strip()
+        if proc.returncode == 0 and output:
+            if cache is not None and elapsed >= LLM_CACHE_MIN_SECONDS:
+                cache[key] = output
+                save_llm_cache(memory_dir, cache)
+            return output
+
+        stderr = stderr.decode('utf-8', 'replace')
+        if stderr.strip():
+            log_error(f"claude -p stderr: {stderr[:500]}")
 
         return None
     except FileNotFoundError:
         log_error("claude CLI not found in PATH")
         return None
-    except subprocess.TimeoutExpired:
-        log_error("claude -p timed out")
-        return None
     except Exception as e:
         log_error(f"claude -p failed: {e}")
         return None
@@ -269,43 +274,37 @@ def parse_observer_output(raw_output):
     Uses line-start anchored regex (like Mastra) to avoid matching inline mentions.
     Falls back to treating the entire output as observations if no XML tags found.
     """
+    # Cheap substring checks first; the regexes only run for tags that are present
+    has_obs = '<observations>' in raw_output
+    has_task = '<current-task>' in raw_output
+    has_resp = '<suggested-response>' in raw_output
+    if not (has_obs or has_task or has_resp):
+        return raw_output.strip(), None, None
+
     observations = ''
     current_task = None
     suggested_response = None
 
-    # Extract <observations> content — tags must be at start of line
-    obs_match = re.search(
-        r'^[ \t]*<observations>(.*?)^[ \t]*</observations>',
-        raw_output, re.DOTALL | re.MULTILINE
-    )
+    # Extract <observations> content
+    obs_match = _OBS_RE.search(raw_output) if has_obs else None
     if obs_match:
         observations = obs_match.group(1).strip()
     else:
         # Fallback: treat entire output as observations (minus line-start XML tags)
         observations = raw_output
-        observations = re.sub(
-            r'^[ \t]*<current-task>.*?^[ \t]*</current-task>',
-            '', observations, flags=re.DOTALL | re.MULTILINE
-        )
-        observations = re.sub(
-            r'^[ \t]*<suggested-response>.*?^[ \t]*</suggested-response>',
-            '', observations, flags=re.DOTALL | re.MULTILINE
-        )
+        if has_task:
+            observations = _CT_SUB_RE.sub('', observations)
+        if has_resp:
+            observations = _SR_SUB_RE.sub('', observations)
         observations = observations.strip()
 
-    # Extract <current-task> — tags must be at start of line
-    task_match = re.search(
-        r'^[ \t]*<current-task>(.*?)^[ \t]*</current-task>',
-        raw_output, re.DOTALL | re.MULTILINE
-    )
+    # Extract <current-task>
+    task_match = _TASK_RE.search(raw_output) if has_task else None
     if task_match:
         current_task = task_match.group(1).strip() or None
 
-    # Extract <suggested-response> — tags must be at start of line
-    resp_match = re.search(
-        r'^[ \t]*<suggested-response>(.*?)^[ \t]*</suggested-response>',
-        raw_output, re.DOTALL | re.MULTILINE
-    )
+    # Extract <suggested-response>
+    resp_match = _RESP_RE.search(raw_output) if has_resp else None
     if resp_match:
         suggested_response = resp_match.group(1).strip() or None
 
@@ -358,12 +357,13 @@ def run_reflector(memory_dir):
         f"Target: ~{len(content) // 2} characters."
     )
 
-    result = call_claude(system_prompt, user_prompt, model=REFLECTOR_MODEL)
+    result = call_claude(system_prompt, user_prompt, model=REFLECTOR_MODEL, memory_dir=memory_dir)
     if not result or len(result.strip()) < 100:
         return
 
     # Archive the pre-reflection version
     archive_file = memory_dir / 'reflections.log'
+    rotate_archive(archive_file)
     try:
         with open(archive_file, 'a') as f:
             ts = datetime.now(timezone.utc).isoformat()
@@ -377,7 +377,34 @@ def run_reflector(memory_dir):
         pass
 
     # Replace observations with reflected version
-    observations_file.write_text(result.strip() + '\n')
+    write_atomic(observations_file, result.strip() + '\n')
+
+
+def _find_latest_transcript(projects_dir):
+    """Return the most recently modified session transcript under projects_dir, or None."""
+    best = None
+    best_mtime = -1
+    with os.scandir(projects_dir) as projects:
+        for proj in projects:
+            if not proj.is_dir():
+                continue
+            try:
+                entries = os.scandir(proj.path)
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if not entry.name.endswith('.jsonl'):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        mtime = entry.stat().st_mtime
+                    except OSError:
+                        continue
+                    if mtime > best_mtime:
+                        best_mtime, best = mtime, entry.path
+    return best
 
 
 def main():
@@ -397,35 +424,45 @@ def main():
         return
 
     transcript_path = input_data.get('transcript_path', '')
-    if not transcript_path or not os.path.exists(transcript_path):
+    if not transcript_path:
+        return
+    try:
+        transcript_size = os.path.getsize(transcript_path)
+    except OSError:
         return
 
     # Determine memory directory
     memory_dir = get_memory_dir(transcript_path)
 
-    # Read transcript
-    all_messages = read_transcript(transcript_path)
-    if not all_messages:
-        return
-
     # Load state to find unobserved messages
     state = load_state(memory_dir)
 
     # Determine new messages based on cursor
     last_line = state.get('last_observed_line', 0)
+    byte_offset = state.get('byte_offset', 0)
     last_transcript = state.get('transcript_path', '')
 
-    # Reset cursor if transcript changed (new session)
-    if last_transcript != transcript_path:
+    # Reset cursor if transcript changed (new session) or was rewritten
+    if last_transcript != transcript_path or transcript_size < byte_offset:
         last_line = 0
+        byte_offset = 0
 
-    new_messages = [m for m in all_messages if m.get('_line_num', 0) >= last_line]
+    # Raw JSONL is always longer than the text extracted from it, so skip
+    # parsing entirely when the unobserved bytes can't reach the threshold
+    if transcript_size - byte_offset < MIN_NEW_CONTENT_CHARS:
+        return
+
+    # Only parse lines past the cursor
+    new_messages = list(iter_transcript(transcript_path, start_line=last_line, byte_offset=byte_offset))
     if not new_messages:
         return
 
-    # Format new messages
-    new_text = format_messages_for_observer(new_messages)
-    if len(new_text) < MIN_NEW_CONTENT_CHARS:
+    max_line = new_messages[-1]['_line_num']
+    end_offset = new_messages[-1]['_end_offset']
+
+    # Cheap gate: only format enough messages to know the threshold is reached
+    _, new_chars = format_messages_tail(new_messages, budget=MIN_NEW_CONTENT_CHARS)
+    if new_chars < MIN_NEW_CONTENT_CHARS:
         return
 
     # Load existing observations
@@ -438,33 +475,26 @@ def main():
         log_error("Observer system prompt not found", memory_dir)
         return
 
-    # Build and send observer prompt
+    # Build and send observer prompt (keeps the most recent new messages)
+    new_text, _ = format_messages_tail(new_messages, MAX_NEW_CONTENT_CHARS)
     user_prompt = build_observer_prompt(new_text, existing)
 
-    # Truncate if too large (keep last 50k chars of new messages)
-    if len(user_prompt) > 80000:
-        truncated_text = new_text[-50000:]
-        user_prompt = build_observer_prompt(truncated_text, existing)
-
-    result = call_claude(system_prompt, user_prompt, model=OBSERVER_MODEL)
+    result = call_claude(system_prompt, user_prompt, model=OBSERVER_MODEL, memory_dir=memory_dir)
 
     if not result or result.strip() == 'NO_NEW_OBSERVATIONS':
         # Still update cursor even if nothing new
-        max_line = max(m.get('_line_num', 0) for m in all_messages)
-        save_state(memory_dir, max_line + 1, transcript_path)
+        save_state(memory_dir, max_line + 1, transcript_path, byte_offset=end_offset)
         return
 
     # Parse XML sections from result
     observations_text, current_task, suggested_response = parse_observer_output(result)
 
     # Clean up the observations
-    observations_text = re.sub(r'^```\w*\n?', '', observations_text)
-    observations_text = re.sub(r'\n?```$', '', observations_text)
-    observations_text = observations_text.strip()
+    observations_text = strip_fence(observations_text).strip()
 
     if not observations_text:
-        max_line = max(m.get('_line_num', 0) for m in all_messages)
-        save_state(memory_dir, max_line + 1, transcript_path, current_task, suggested_response)
+        save_state(memory_dir, max_line + 1, transcript_path, current_task, suggested_response,
+                   byte_offset=end_offset)
         return
 
     # Append new observations
@@ -473,14 +503,15 @@ def main():
             f.write('\n\n')
         f.write(observations_text)
         f.write('\n')
+        # Byte offset after append; an upper bound on char count for the threshold
+        new_size = f.tell()
 
     # Update cursor with task continuity data
-    max_line = max(m.get('_line_num', 0) for m in all_messages)
-    save_state(memory_dir, max_line + 1, transcript_path, current_task, suggested_response)
+    save_state(memory_dir, max_line + 1, transcript_path, current_task, suggested_response,
+               byte_offset=end_offset)
 
     # Check if reflection is needed
-    updated_content = observations_file.read_text()
-    if len(updated_content) >= REFLECTION_THRESHOLD_CHARS:
+    if new_size >= REFLECTION_THRESHOLD_CHARS:
         run_reflector(memory_dir)
 
     # Output system message for async hook delivery
@@ -488,7 +519,7 @@ def main():
         "systemMessage": (
             f"[Observational Memory] Extracted observations from "
             f"{len(new_messages)} new messages. "
-            f"Observations file: {len(updated_content)} chars."
+            f"Observations file: {new_size} chars."
         )
     }
     print(json.dumps(output))
@@ -497,29 +528,23 @@ def main():
 # Allow running as a standalone script with --force flag
 if __name__ == '__main__':
     if '--force' in sys.argv:
-        import glob
-
         projects_dir = Path.home() / '.claude' / 'projects'
         if not projects_dir.exists():
             print("No projects directory found")
             sys.exit(1)
 
-        transcripts = glob.glob(str(projects_dir / '**' / '*.jsonl'), recursive=True)
-        if not transcripts:
+        transcript_path = _find_latest_transcript(projects_dir)
+        if not transcript_path:
             print("No transcripts found")
             sys.exit(1)
 
-        transcripts.sort(key=os.path.getmtime, reverse=True)
-        transcript_path = transcripts[0]
-
         memory_dir = get_memory_dir(transcript_path)
 
-        all_messages = read_transcript(transcript_path)
+        all_messages, new_text = read_transcript_tail(transcript_path, MAX_NEW_CONTENT_CHARS)
         if not all_messages:
             print("No messages in transcript")
             sys.exit(0)
 
-        new_text = format_messages_for_observer(all_messages)
         existing = ''
         observations_file = memory_dir / 'observations.md'
         if observations_file.exists():
@@ -531,23 +556,18 @@ if __name__ == '__main__':
             sys.exit(1)
 
         user_prompt = build_observer_prompt(new_text, existing)
-        if len(user_prompt) > 80000:
-            new_text = new_text[-50000:]
-            user_prompt = build_observer_prompt(new_text, existing)
 
-        result = call_claude(system_prompt, user_prompt)
+        result = call_claude(system_prompt, user_prompt, memory_dir=memory_dir)
         if result and result.strip() != 'NO_NEW_OBSERVATIONS':
-            cleaned = result.strip()
-            cleaned = re.sub(r'^```\w*\n?', '', cleaned)
-            cleaned = re.sub(r'\n?```$', '', cleaned)
+            cleaned = strip_fence(result.strip())
             with open(observations_file, 'a') as f:
                 if existing:
                     f.write('\n\n')
                 f.write(cleaned)
                 f.write('\n')
             print(f"Observations extracted and saved to {observations_file}")
-            max_line = max(m.get('_line_num', 0) for m in all_messages)
-            save_state(memory_dir, max_line + 1, transcript_path)
+            last = all_messages[-1]
+            save_state(memory_dir, last['_line_num'] + 1, transcript_path, byte_offset=last['_end_offset'])
         else:
             print("No new observations to extract")
     else:
@@ -11,10 +11,15 @@ import json
 import sys
 import os
 import subprocess
-import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+from _om_common import (
+    LLM_CACHE_MIN_SECONDS, get_memory_dir, get_memory_dir_from_cwd, llm_cache_key,
+    load_llm_cache, rotate_archive, save_llm_cache, strip_fence, write_atomic,
+)
+
 # Model shorthand for claude CLI
 REFLECTOR_MODEL = os.environ.get("OM_REFLECTOR_MODEL", "haiku")
 # Minimum size to bother reflecting (chars)
@@ -25,6 +30,9 @@ MAX_COMPRESSION_RETRIES = 3
 # Script directory for locating prompts
 SCRIPT_DIR = Path(__file__).resolve().parent
 
+# Environment for child `claude -p` calls, built on first use
+_BASE_ENV = None
+
 # Graduated compression guidance (level 0, 1, 2)
 COMPRESSION_GUIDANCE = {
     0: '',  # No extra guidance on first attempt
@@ -54,30 +62,6 @@ Target detail level: 6/10 (significantly more condensed).
 }
 
 
-def get_project_dir(transcript_path):
-    """Extract the project directory from the transcript path."""
-    match = re.search(r'(.*?/\.claude/projects/[^/]+)', transcript_path)
-    if match:
-        return Path(match.group(1))
-    return Path(transcript_path).parent
-
-
-def get_memory_dir_from_transcript(transcript_path):
-    """Derive the project memory directory from transcript path."""
-    project_dir = get_project_dir(transcript_path)
-    memory_dir = project_dir / 'memory'
-    memory_dir.mkdir(parents=True, exist_ok=True)
-    return memory_dir
-
-
-def get_memory_dir_from_cwd(cwd):
-    """Derive the project memory directory from working directory."""
-    project_key = cwd.replace('/', '-')
-    memory_dir = Path.home() / '.claude' / 'projects' / project_key / 'memory'
-    memory_dir.mkdir(parents=True, exist_ok=True)
-    return memory_dir
-
-
 def load_prompt():
     """Load the reflector system prompt."""
     prompt_file = SCRIPT_DIR / 'prompts' / 'reflector-system.md'
@@ -86,10 +70,12 @@ def load_prompt():
     return ""
 
 
-def call_claude(system_prompt, user_prompt):
+def call_claude(system_prompt, user_prompt, memory_dir=None):
     """Call Claude via `claude -p` pipe mode.
 
     Uses an environment variable guard to prevent recursive hook invocation.
+    When `memory_dir` is given, responses are cached by a hash of the model
+    and prompt so identical requests don't spawn `claude -p` again.
     """
     if os.environ.get('OM_HOOK_ACTIVE'):
         return None
@@ -99,33 +85,58 @@ def call_claude(system_prompt, user_prompt):
         f"{user_prompt}"
     )
 
-    env = os.environ.copy()
-    env['OM_HOOK_ACTIVE'] = '1'
-    env.pop('CLAUDECODE', None)  # Allow nested claude -p invocation
+    cache = None
+    if memory_dir is not None:
+        key = llm_cache_key(REFLECTOR_MODEL, full_prompt)
+        cache = load_llm_cache(memory_dir)
+        if key in cache:
+            return cache[key]
+
+    # Set guard env var so any child `claude -p` won't re-trigger this hook.
+    # Built once and never mutated afterwards, so it is safe to share.
+    global _BASE_ENV
+    if _BASE_ENV is None:
+        env = dict(os.environ)
+        env['OM_HOOK_ACTIVE'] = '1'
+        env.pop('CLAUDECODE', None)  # Allow nested claude -p invocation
+        _BASE_ENV = env
+    env = _BASE_ENV
 
     try:
-        result = subprocess.run(
+        # Hand the pre-encoded prompt to the pipe and decode stdout once
+        prompt_bytes = full_prompt.encode('utf-8')
+        started = time.monotonic()
+        with subprocess.Popen(
             ['claude', '-p', '--model', REFLECTOR_MODEL],
-            input=full_prompt,
-            capture_output=True,
-            text=True,
-            timeout=180,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             env=env,
-        )
-
-        if result.returncode == 0 and result.stdout.strip():
-            return result.stdout.strip()
-
-        if result.stderr.strip():
-            log_error(f"claude -p stderr: {result.stderr[:500]}")
+        ) as proc:
+            try:
+                stdout, stderr = proc.communicate(prompt_bytes, timeout=180)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.communicate()
+                log_error("claude -p timed out")
+                return None
+        elapsed = time.monotonic() - started
+
+        output = stdout.decode('utf-8', 'replace').strip()
+        if proc.returncode == 0 and output:
+            if cache is not None and elapsed >= LLM_CACHE_MIN_SECONDS:
+                cache[key] = output
+                save_llm_cache(memory_dir, cache)
+            return output
+
+        stderr = stderr.decode('utf-8', 'replace')
+        if stderr.strip():
+            log_error(f"claude -p stderr: {stderr[:500]}")
 
         return None
     except FileNotFoundError:
         log_error("claude CLI not found in PATH")
         return None
-    except subprocess.TimeoutExpired:
-        log_error("claude -p timed out")
-        return None
     except Exception as e:
         log_error(f"claude -p failed: {e}")
         return None
@@ -181,18 +192,14 @@ def reflect(memory_dir, force=False):
         if guidance:
             user_prompt += f"\n{guidance}"
 
-        result = call_claude(system_prompt, user_prompt)
+        result = call_claude(system_prompt, user_prompt, memory_dir=memory_dir)
         if not result or len(result.strip()) < 50:
             if level == 0:
                 return False, "Reflector returned empty or too-short result"
             break  # Use the previous attempt's result
 
         # Clean up
-        candidate = result.strip()
-        candidate = re.sub(r'^```\w*\n?', '', candidate)
-        candidate = re.sub(r'\n?```$', '', candidate)
-
-        reflected = candidate
+        reflected = strip_fence(result.strip())
 
         # Check if compression was sufficient
         if len(reflected) <= len(content):
@@ -210,6 +217,7 @@ def reflect(memory_dir, force=False):
 
     # Archive pre-reflection version
     archive_file = memory_dir / 'reflections.log'
+    rotate_archive(archive_file)
     try:
         with open(archive_file, 'a') as f:
             ts = datetime.now(timezone.utc).isoformat()
@@ -224,7 +232,7 @@ def reflect(memory_dir, force=False):
         pass
 
     # Write reflected observations
-    observations_file.write_text(reflected + '\n')
+    write_atomic(observations_file, reflected + '\n')
 
     return True, f"Reflected: {len(content)} -> {len(reflected)} chars ({len(reflected) / len(content):.0%})"
 
@@ -245,7 +253,7 @@ def main():
     if not transcript_path:
         return
 
-    memory_dir = get_memory_dir_from_transcript(transcript_path)
+    memory_dir = get_memory_dir(transcript_path)
     success, message = reflect(memory_dir)
 
     if success: